@@ -1,26 +1,30 @@
 """
 FastAPI application for Speech-to-Text service using NVIDIA Parakeet model
 """
+import asyncio
 import os
-import logging
 import uuid
 from pathlib import Path
-from typing import Dict
+from typing import Dict, Optional
 
-from fastapi import FastAPI, UploadFile, File, HTTPException
+from fastapi import FastAPI, UploadFile, File, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from pydantic import BaseModel
 import uvicorn
 
 from config import (
-    HOST, PORT, ALLOWED_ORIGINS, UPLOAD_DIR, TEMP_DIR, ALLOWED_FORMATS
+    HOST, PORT, WORKERS, MODEL_NAME, ALLOWED_ORIGINS, UPLOAD_DIR, TEMP_DIR, ALLOWED_FORMATS,
+    MAX_AUDIO_DURATION, MAX_UPLOAD_BYTES, RESULT_CACHE_SIZE
 )
-from audio_utils import convert_to_wav, validate_audio
-from model_service import get_model_service
+from audio_utils import decode_audio
+from model_service import get_model_service, model_service_ready
+from result_cache import ResultCache, hash_upload
+from logging_config import get_logger, request_id_var, setup_logging, stop_logging
+from gpu_workers import check_worker_count, visible_gpus
 
 # Configure logging
-logging.basicConfig(level=logging.INFO)
-logger = logging.getLogger(__name__)
+setup_logging()
+logger = get_logger(__name__)
 
 # Initialize FastAPI app
 app = FastAPI(
@@ -36,24 +40,78 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Request-ID"],
 )
 
+
+@app.middleware("http")
+async def request_id_middleware(request: Request, call_next):
+    """Tag logs and the response with the caller's X-Request-ID (or a new one)"""
+    request_id = request.headers.get("X-Request-ID") or uuid.uuid4().hex
+    token = request_id_var.set(request_id)
+    try:
+        response = await call_next(request)
+    finally:
+        request_id_var.reset(token)
+
+    response.headers["X-Request-ID"] = request_id
+    return response
+
+
+class TranscriptionResponse(BaseModel):
+    """Body of a successful /transcribe response (serialized by Pydantic's JSON encoder)"""
+    success: bool
+    text: str
+    language: Optional[str]
+    audio_duration: float
+    original_filename: Optional[str]
+
+
+# Exit status Gunicorn treats as a failed worker boot (gunicorn.arbiter.Arbiter.WORKER_BOOT_ERROR)
+WORKER_BOOT_ERROR = 3
+
 # Global model service instance
 model_service = None
+model_load_error = None
+_model_load_task = None
 
+# Results of recent transcriptions, keyed by upload content hash
+result_cache = ResultCache(RESULT_CACHE_SIZE)
 
-@app.on_event("startup")
-async def startup_event():
-    """Initialize model on startup"""
-    global model_service
+
+async def load_model():
+    """Load the model in a worker thread so routes stay responsive meanwhile"""
+    global model_service, model_load_error
     try:
-        logger.info("Starting up application...")
         logger.info("Loading ASR model (this may take a few minutes)...")
-        model_service = get_model_service()
+        service = await asyncio.to_thread(get_model_service)
+        service.start_batching()
+        model_service = service
         logger.info("Application ready!")
     except Exception as e:
+        model_load_error = str(e)
         logger.error(f"Failed to initialize model: {str(e)}")
-        raise
+
+        # Exit with Gunicorn's worker boot error status so the arbiter halts
+        # instead of respawning a worker that fails the same way, and a
+        # supervisor of `python app.py` sees a non-zero exit
+        stop_logging()
+        os._exit(WORKER_BOOT_ERROR)
+
+
+@app.on_event("startup")
+async def startup_event():
+    """Start loading the model on startup"""
+    global _model_load_task
+    logger.info("Starting up application...")
+    _model_load_task = asyncio.create_task(load_model())
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop background batching on shutdown"""
+    if model_service is not None:
+        await model_service.stop_batching()
 
 
 @app.get("/")
@@ -73,7 +131,7 @@ async def root():
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
-    if model_service is None:
+    if not model_service_ready.is_set() or model_service is None:
         raise HTTPException(status_code=503, detail="Model not initialized")
 
     return {
@@ -86,12 +144,16 @@ async def health_check():
 async def model_info():
     """Get model information"""
     if model_service is None:
-        raise HTTPException(status_code=503, detail="Model not initialized")
+        return {
+            "model_name": MODEL_NAME,
+            "status": "failed" if model_load_error else "loading",
+            "error": model_load_error
+        }
 
     return model_service.get_model_info()
 
 
-@app.post("/transcribe")
+@app.post("/transcribe", response_model=TranscriptionResponse)
 async def transcribe_audio(audio: UploadFile = File(...)):
     """
     Transcribe audio file to text
@@ -105,8 +167,6 @@ async def transcribe_audio(audio: UploadFile = File(...)):
     if model_service is None:
         raise HTTPException(status_code=503, detail="Model not initialized")
 
-    # Generate unique filename
-    file_id = str(uuid.uuid4())
     file_extension = Path(audio.filename).suffix.lower()
 
     # Validate file format
@@ -116,36 +176,53 @@ async def transcribe_audio(audio: UploadFile = File(...)):
             detail=f"Unsupported file format. Allowed formats: {', '.join(ALLOWED_FORMATS)}"
         )
 
-    # Save uploaded file
-    input_path = os.path.join(TEMP_DIR, f"{file_id}_input{file_extension}")
-    wav_path = os.path.join(TEMP_DIR, f"{file_id}_converted.wav")
+    # Reject oversized uploads before hashing or decoding them
+    if audio.size and audio.size > MAX_UPLOAD_BYTES:
+        raise HTTPException(
+            status_code=413,
+            detail=f"File too large. Maximum upload size is {MAX_UPLOAD_BYTES // (1024 * 1024)} MiB"
+        )
 
     try:
-        # Save uploaded file
         logger.info(f"Receiving audio file: {audio.filename}")
-        with open(input_path, "wb") as f:
-            content = await audio.read()
-            f.write(content)
 
-        # Convert to WAV format
-        logger.info("Converting audio to 16kHz WAV format...")
+        # Repeated uploads of the same audio skip decoding and inference
+        content_hash = await asyncio.to_thread(hash_upload, audio.file)
+        cached = await result_cache.get(content_hash)
+        if cached is not None:
+            logger.info("Returning cached transcription")
+            return {
+                "success": True,
+                **cached,
+                "original_filename": audio.filename
+            }
+
+        # Stream the spooled upload straight into the decoder
+        logger.info("Decoding audio to mono...")
         try:
-            convert_to_wav(input_path, wav_path)
+            # Leave resampling of common rates to the model service's GPU resamplers
+            audio_info = await asyncio.to_thread(
+                decode_audio, audio.file, model_service.gpu_sample_rates
+            )
         except ValueError as e:
             logger.error(f"Audio conversion error: {str(e)}")
             raise HTTPException(status_code=400, detail=f"Audio conversion failed: {str(e)}")
 
-        # Validate the converted audio
-        try:
-            audio_info = validate_audio(wav_path)
-            logger.info(f"Audio validated: {audio_info['duration']:.2f}s")
-        except ValueError as e:
-            logger.error(f"Audio validation error: {str(e)}")
-            raise HTTPException(status_code=400, detail=str(e))
-
-        # Transcribe
+        # Validate the decoded audio
+        if audio_info["duration"] > MAX_AUDIO_DURATION:
+            logger.error(f"Audio validation error: {audio_info['duration']:.1f}s too long")
+            raise HTTPException(
+                status_code=400,
+                detail=f"Audio duration ({audio_info['duration']:.1f}s) exceeds maximum allowed "
+                       f"duration ({MAX_AUDIO_DURATION}s)"
+            )
+        logger.info(f"Audio validated: {audio_info['duration']:.2f}s")
+
+        # Transcribe via the batching queue so concurrent requests share a model call
         logger.info("Transcribing audio...")
-        result = model_service.transcribe(wav_path)
+        result = await model_service.transcribe_async(
+            audio_info["audio"], audio_info["sample_rate"]
+        )
 
         # Prepare response
         response = {
@@ -158,7 +235,13 @@ async def transcribe_audio(audio: UploadFile = File(...)):
 
         logger.info(f"Transcription completed: {len(result['text'])} characters")
 
-        return JSONResponse(content=response)
+        await result_cache.put(content_hash, {
+            "text": result["text"],
+            "language": result["language"],
+            "audio_duration": audio_info["duration"]
+        })
+
+        return response
 
     except HTTPException:
         raise
@@ -169,24 +252,14 @@ async def transcribe_audio(audio: UploadFile = File(...)):
             detail=f"Transcription failed: {str(e)}"
         )
 
-    finally:
-        # Cleanup temporary files
-        try:
-            if os.path.exists(input_path):
-                os.remove(input_path)
-            if os.path.exists(wav_path):
-                os.remove(wav_path)
-        except Exception as e:
-            logger.warning(f"Failed to cleanup temp files: {str(e)}")
-
 
 @app.delete("/cleanup")
 async def cleanup_temp_files():
     """
-    Cleanup all temporary files (admin endpoint)
+    Cleanup all temporary files and cached results (admin endpoint)
 
     Returns:
-        Number of files deleted
+        Number of files deleted and cache entries cleared
     """
     try:
         files = os.listdir(TEMP_DIR)
@@ -195,9 +268,12 @@ async def cleanup_temp_files():
             if os.path.isfile(file_path):
                 os.remove(file_path)
 
+        cache_entries_cleared = await result_cache.clear()
+
         return {
             "success": True,
-            "files_deleted": len(files)
+            "files_deleted": len(files),
+            "cache_entries_cleared": cache_entries_cleared
         }
 
     except Exception as e:
@@ -208,11 +284,21 @@ async def cleanup_temp_files():
 
 
 if __name__ == "__main__":
-    logger.info(f"Starting server on {HOST}:{PORT}")
+    gpus = visible_gpus()
+    check_worker_count(WORKERS, gpus)
+    if gpus and WORKERS > 1:
+        # uvicorn cannot give each worker its own CUDA_VISIBLE_DEVICES
+        raise SystemExit(
+            "Multiple GPU workers need per-worker GPU pinning; "
+            "run 'gunicorn -c gunicorn.conf.py app:app' instead"
+        )
+
+    logger.info(f"Starting server on {HOST}:{PORT} with {WORKERS} worker(s)")
     uvicorn.run(
         "app:app",
         host=HOST,
         port=PORT,
+        workers=WORKERS,
         reload=False,
         log_level="info"
     )
@@ -1,15 +1,200 @@
 """
 Audio processing utilities for converting and validating audio files
 """
+import json
 import os
-import librosa
+import shutil
+import subprocess
+import threading
+import numpy as np
 import soundfile as sf
+import soxr
 import tempfile
 from pathlib import Path
-from config import SAMPLE_RATE, MAX_AUDIO_DURATION
+from typing import BinaryIO, Collection, Tuple, Union
+from config import SAMPLE_RATE, MAX_AUDIO_DURATION, TEMP_DIR
+from downmix import downmix_i16_to_f32_mono
 
+# Chunk size used when streaming uploads into the decoder
+STREAM_CHUNK_SIZE = 1 << 20  # 1 MiB
 
-def convert_to_wav(input_path: str, output_path: str = None) -> str:
+
+def _is_mp4_container(file: BinaryIO) -> bool:
+    """
+    Check for an ISO base media (MP4/M4A) header without moving the file position
+
+    Args:
+        file: Seekable binary file object
+
+    Returns:
+        True if the file starts with an 'ftyp' box
+    """
+    position = file.tell()
+    header = file.read(12)
+    file.seek(position)
+
+    return header[4:8] == b'ftyp'
+
+
+def _decode_with_soundfile(source, keep_rates: Collection[int] = ()) -> Tuple[np.ndarray, int]:
+    """
+    Decode a file with libsndfile and resample it with soxr
+
+    Args:
+        source: Path or file-like object with the encoded audio
+        keep_rates: Native sample rates to keep; any other rate is resampled to SAMPLE_RATE
+
+    Returns:
+        Tuple of (mono float32 audio, its sample rate)
+    """
+    with sf.SoundFile(source) as f:
+        sr = f.samplerate
+        if f.subtype == 'PCM_16':
+            # Read raw int16 and downmix + scale in one fused pass
+            data = downmix_i16_to_f32_mono(f.read(dtype='int16', always_2d=True))
+        else:
+            data = f.read(dtype='float32', always_2d=False)
+
+            # Downmix to mono
+            if data.ndim == 2:
+                data = data.mean(axis=1)
+
+    if sr != SAMPLE_RATE and sr not in keep_rates:
+        data = soxr.resample(data, sr, SAMPLE_RATE, quality='HQ')
+        sr = SAMPLE_RATE
+
+    return data, sr
+
+
+def _decode_with_ffmpeg(source: Union[str, BinaryIO]) -> np.ndarray:
+    """
+    Decode a file libsndfile cannot parse with a single FFmpeg process
+    piping 16kHz mono float32 PCM
+
+    Args:
+        source: Path to the input file, or a binary file object streamed
+            through stdin in STREAM_CHUNK_SIZE chunks
+
+    Returns:
+        Mono float32 audio at SAMPLE_RATE
+    """
+    if not isinstance(source, str) and _is_mp4_container(source):
+        # MP4/M4A may keep the moov atom at the end, which FFmpeg cannot seek to
+        # through a pipe, so decode from a scratch copy instead
+        fd, scratch_path = tempfile.mkstemp(suffix='.m4a', dir=TEMP_DIR)
+        try:
+            with os.fdopen(fd, 'wb') as scratch:
+                shutil.copyfileobj(source, scratch, STREAM_CHUNK_SIZE)
+            return _decode_with_ffmpeg(scratch_path)
+        finally:
+            os.remove(scratch_path)
+
+    if isinstance(source, str):
+        proc = subprocess.run(
+            ['ffmpeg', '-nostdin', '-loglevel', 'error', '-i', source,
+             '-f', 'f32le', '-ac', '1', '-ar', str(SAMPLE_RATE), '-'],
+            capture_output=True,
+            check=True
+        )
+        stdout = proc.stdout
+    else:
+        proc = subprocess.Popen(
+            ['ffmpeg', '-loglevel', 'error', '-i', 'pipe:0',
+             '-f', 'f32le', '-ac', '1', '-ar', str(SAMPLE_RATE), '-'],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE
+        )
+
+        # Feed stdin from a helper thread while communicate() drains the output
+        stdin, proc.stdin = proc.stdin, None
+
+        def feed():
+            try:
+                shutil.copyfileobj(source, stdin, STREAM_CHUNK_SIZE)
+            except BrokenPipeError:
+                pass  # FFmpeg exited early; the error surfaces via its return code
+            finally:
+                try:
+                    stdin.close()
+                except BrokenPipeError:
+                    pass
+
+        feeder = threading.Thread(target=feed, daemon=True)
+        feeder.start()
+        stdout, stderr = proc.communicate()
+        feeder.join()
+
+        if proc.returncode != 0:
+            raise subprocess.CalledProcessError(proc.returncode, proc.args, stdout, stderr)
+
+    return np.frombuffer(stdout, dtype=np.float32)
+
+
+def _decode(
+    source: Union[str, BinaryIO], keep_rates: Collection[int] = ()
+) -> Tuple[np.ndarray, int]:
+    """
+    Decode audio to mono float32, trying libsndfile before FFmpeg
+
+    Args:
+        source: Path to the input file, or a binary file object
+        keep_rates: Native sample rates libsndfile output is kept at; FFmpeg
+            output is always produced at SAMPLE_RATE
+
+    Returns:
+        Tuple of (mono float32 audio, its sample rate)
+
+    Raises:
+        ValueError: If the audio cannot be decoded
+    """
+    try:
+        try:
+            return _decode_with_soundfile(source, keep_rates)
+        except sf.LibsndfileError:
+            # Not a format libsndfile understands (e.g. WebM, M4A)
+            if not isinstance(source, str):
+                source.seek(0)
+            return _decode_with_ffmpeg(source), SAMPLE_RATE
+
+    except subprocess.CalledProcessError as e:
+        stderr = e.stderr.decode(errors='replace').strip()
+        raise ValueError(f"Failed to decode audio: {stderr}")
+    except Exception as e:
+        raise ValueError(f"Failed to decode audio: {str(e)}")
+
+
+def decode_audio(file: BinaryIO, keep_rates: Collection[int] = ()) -> dict:
+    """
+    Decode an uploaded audio file object without buffering it in memory
+
+    The file is read in chunks (libsndfile seeks through it, FFmpeg gets it
+    streamed over stdin), so peak memory is the decoded samples only.
+
+    Args:
+        file: Seekable binary file object positioned anywhere
+        keep_rates: Native sample rates to keep rather than resample to
+            SAMPLE_RATE on the CPU (those the model service resamples on the GPU)
+
+    Returns:
+        Dictionary with the decoded samples and their metadata
+        (audio, duration, sample_rate, channels)
+
+    Raises:
+        ValueError: If the audio cannot be decoded
+    """
+    file.seek(0)
+    audio, sample_rate = _decode(file, keep_rates)
+
+    return {
+        "audio": audio,
+        "duration": len(audio) / sample_rate,
+        "sample_rate": sample_rate,
+        "channels": 1
+    }
+
+
+def convert_to_wav(input_path: str, output_path: str = None) -> dict:
     """
     Convert audio file to 16kHz mono WAV format required by the model
 
@@ -18,25 +203,62 @@ def convert_to_wav(input_path: str, output_path: str = None) -> str:
         output_path: Path to output WAV file (optional, creates temp file if not provided)
 
     Returns:
-        Path to converted WAV file
+        Dictionary with the converted file path and its metadata
+        (path, duration, sample_rate, channels)
     """
     try:
-        # Load audio file and convert to target sample rate
-        audio, sr = librosa.load(input_path, sr=SAMPLE_RATE, mono=True)
+        # Decode audio file and convert to target sample rate
+        audio, _ = _decode(input_path)
 
         # Create output path if not provided
         if output_path is None:
             output_path = input_path.rsplit('.', 1)[0] + '_converted.wav'
 
         # Save as WAV file
-        sf.write(output_path, audio, SAMPLE_RATE)
+        sf.write(output_path, audio, SAMPLE_RATE, subtype='PCM_16')
 
-        return output_path
+        return {
+            "path": output_path,
+            "duration": len(audio) / SAMPLE_RATE,
+            "sample_rate": SAMPLE_RATE,
+            "channels": 1
+        }
 
     except Exception as e:
         raise ValueError(f"Failed to convert audio file: {str(e)}")
 
 
+def _probe_with_ffprobe(file_path: str) -> dict:
+    """
+    Read duration, sample rate and channels from container metadata via ffprobe
+
+    Args:
+        file_path: Path to audio file
+
+    Returns:
+        Dictionary with duration, sample_rate and channels
+    """
+    proc = subprocess.run(
+        ['ffprobe', '-v', 'quiet', '-print_format', 'json',
+         '-show_format', '-show_streams', '-select_streams', 'a:0', file_path],
+        capture_output=True,
+        check=True
+    )
+    probe = json.loads(proc.stdout)
+    stream = probe["streams"][0] if probe.get("streams") else {}
+
+    # MediaRecorder WebM usually has no container duration; try the stream's
+    duration = probe.get("format", {}).get("duration") or stream.get("duration")
+    if duration is None:
+        raise ValueError("Audio duration unavailable from file metadata")
+
+    return {
+        "duration": float(duration),
+        "sample_rate": int(stream.get("sample_rate", 0)),
+        "channels": int(stream.get("channels", 0))
+    }
+
+
 def validate_audio(file_path: str) -> dict:
     """
     Validate audio file and return metadata
@@ -51,11 +273,16 @@ def validate_audio(file_path: str) -> dict:
         ValueError: If audio is invalid or too long
     """
     try:
-        # Load audio to check properties
-        audio, sr = librosa.load(file_path, sr=None, mono=False)
-
-        # Calculate duration
-        duration = librosa.get_duration(y=audio, sr=sr)
+        # Read the header only; no samples are decoded
+        try:
+            info = sf.info(file_path)
+            duration = info.frames / info.samplerate
+            sample_rate, channels = info.samplerate, info.channels
+        except sf.LibsndfileError:
+            # Formats libsndfile cannot parse (e.g. WebM) carry duration in the container
+            probe = _probe_with_ffprobe(file_path)
+            duration = probe["duration"]
+            sample_rate, channels = probe["sample_rate"], probe["channels"]
 
         # Check if duration exceeds maximum
         if duration > MAX_AUDIO_DURATION:
@@ -64,12 +291,9 @@ def validate_audio(file_path: str) -> dict:
                 f"duration ({MAX_AUDIO_DURATION}s)"
             )
 
-        # Get number of channels
-        channels = 1 if audio.ndim == 1 else audio.shape[0]
-
         return {
             "duration": duration,
-            "sample_rate": sr,
+            "sample_rate": sample_rate,
             "channels": channels,
             "valid": True
         }
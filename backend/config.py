@@ -10,15 +10,35 @@ MODEL_NAME = "nvidia/parakeet-tdt-0.6b-v3"
 SAMPLE_RATE = 16000  # Required by Parakeet model
 MAX_AUDIO_DURATION = 24 * 60  # 24 minutes in seconds
 ALLOWED_FORMATS = ['.wav', '.webm', '.mp3', '.flac', '.m4a', '.ogg']
+MAX_UPLOAD_BYTES = 150 * 1024 * 1024  # 150 MiB: 24 minutes of 16kHz mono PCM plus headroom
 
-# File paths
-BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-UPLOAD_DIR = os.path.join(BASE_DIR, "uploads")
-TEMP_DIR = os.path.join(UPLOAD_DIR, "temp")
+# Request batching configuration
+MAX_BATCH_SIZE = 8  # Maximum requests per model call
+MAX_BATCH_SECONDS = 300  # Maximum total audio per model call; longer inputs run alone
+BATCH_WINDOW_MS = 20  # How long to wait for more requests before running a batch
+# Pinned host buffers pooled for GPU uploads, bucketed by audio duration in seconds.
+# Audio is uploaded at its native rate, so buffers are sized for STAGING_MAX_SAMPLE_RATE.
+STAGING_BUCKETS = [5, 30, 120, 1440]
+STAGING_MAX_SAMPLE_RATE = 48000
+STAGING_PREALLOCATE = {5: 2, 30: 2, 120: 1}  # Buffers pinned at startup (~37 MiB per worker)
+STAGING_POOL_MAX_BYTES = 512 * 1024 * 1024  # Cap on pinned memory the pool keeps per worker
+
+# Number of transcription results cached by upload content hash
+RESULT_CACHE_SIZE = 256
 
 # Server configuration
 HOST = "0.0.0.0"
 PORT = 8000
+# Each worker loads its own model copy; on GPU machines it must not exceed the GPU count
+WORKERS = int(os.environ.get("STT_WORKERS", "1"))
+
+# File paths
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+UPLOAD_DIR = os.path.join(BASE_DIR, "uploads")
+# Scratch files (whole MP4/M4A uploads copied for FFmpeg) stay on disk: they can reach
+# MAX_UPLOAD_BYTES, more than a container's default /dev/shm. One directory per port so
+# /cleanup only touches this instance
+TEMP_DIR = os.path.join(UPLOAD_DIR, "temp", str(PORT))
 
 # CORS settings
 ALLOWED_ORIGINS = [
@@ -30,4 +50,4 @@ ALLOWED_ORIGINS = [
 
 # Create necessary directories
 os.makedirs(UPLOAD_DIR, exist_ok=True)
-os.makedirs(TEMP_DIR, exist_ok=True)
+os.makedirs(TEMP_DIR, mode=0o700, exist_ok=True)
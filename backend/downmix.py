@@ -0,0 +1,33 @@
+"""
+Numba kernels for fused channel downmix and PCM-to-float conversion
+"""
+import numba
+import numpy as np
+
+
+# Compiled eagerly at import for C-contiguous (frames, channels) int16 input, so no
+# request pays the JIT. Serial on purpose: the loop is memory-bound and runs from
+# many decode threads at once, where a Numba thread pool would fight torch's.
+@numba.njit("float32[::1](int16[:, ::1])", fastmath=True, nogil=True)
+def downmix_i16_to_f32_mono(x: np.ndarray) -> np.ndarray:
+    """
+    Average int16 channels into mono float32 in [-1, 1) in a single pass
+
+    Avoids the two full-size temporaries of
+    ``x.mean(axis=1).astype(np.float32) / 32768``.
+
+    Args:
+        x: C-contiguous int16 samples with shape (frames, channels)
+
+    Returns:
+        Mono float32 audio with shape (frames,)
+    """
+    n, channels = x.shape
+    scale = np.float32(1.0 / (32768.0 * channels))
+    out = np.empty(n, dtype=np.float32)
+    for i in range(n):
+        acc = np.float32(0.0)
+        for c in range(channels):
+            acc += x[i, c]
+        out[i] = acc * scale
+    return out
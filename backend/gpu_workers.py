@@ -0,0 +1,49 @@
+"""
+Helpers for running one server worker per GPU
+"""
+import os
+import subprocess
+from typing import List
+
+
+def visible_gpus() -> List[str]:
+    """
+    List the GPU ids this process may use, without initializing CUDA
+
+    Honours CUDA_VISIBLE_DEVICES; otherwise asks nvidia-smi. Safe to call in
+    a pre-fork master process.
+
+    Returns:
+        GPU ids as strings (empty when no GPU is available)
+    """
+    env = os.environ.get("CUDA_VISIBLE_DEVICES")
+    if env is not None:
+        return [gpu.strip() for gpu in env.split(",") if gpu.strip() and gpu.strip() != "-1"]
+
+    try:
+        output = subprocess.run(
+            ["nvidia-smi", "-L"], capture_output=True, text=True, check=True
+        ).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return []
+
+    gpus = [line for line in output.splitlines() if line.startswith("GPU ")]
+    return [str(index) for index in range(len(gpus))]
+
+
+def check_worker_count(workers: int, gpus: List[str]):
+    """
+    Refuse worker counts that would put several model copies on one GPU
+
+    Args:
+        workers: Number of worker processes requested
+        gpus: Visible GPU ids
+
+    Raises:
+        SystemExit: If there are GPUs but fewer than workers
+    """
+    if gpus and workers > len(gpus):
+        raise SystemExit(
+            f"STT_WORKERS={workers} but only {len(gpus)} GPU(s) are visible; each worker "
+            f"loads its own model copy and needs a GPU to itself"
+        )
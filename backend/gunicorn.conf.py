@@ -0,0 +1,40 @@
+"""
+Gunicorn configuration for running the Speech-to-Text API with multiple workers
+
+Each worker holds its own model copy and batching queue, so on GPU machines
+every worker is pinned to a GPU of its own via CUDA_VISIBLE_DEVICES.
+
+Usage (Linux/macOS):
+    gunicorn -c gunicorn.conf.py app:app
+"""
+import os
+
+from config import HOST, PORT, WORKERS
+from gpu_workers import check_worker_count, visible_gpus
+
+bind = f"{HOST}:{PORT}"
+workers = WORKERS
+worker_class = "uvicorn.workers.UvicornWorker"
+
+# Model loading can take minutes on first run (download + GPU init)
+timeout = 600
+graceful_timeout = 30
+
+_gpus = visible_gpus()
+check_worker_count(WORKERS, _gpus)
+
+
+def pre_fork(server, worker):
+    """Assign the new worker a GPU slot not held by any live worker"""
+    if not _gpus:
+        return
+
+    taken = {getattr(w, "gpu_slot", None) for w in server.WORKERS.values()}
+    worker.gpu_slot = min(set(range(len(_gpus))) - taken)
+
+
+def post_fork(server, worker):
+    """Restrict the worker to its GPU before the app (and CUDA) is loaded"""
+    if _gpus:
+        os.environ["CUDA_VISIBLE_DEVICES"] = _gpus[worker.gpu_slot]
+        server.log.info(f"Worker {worker.pid} pinned to GPU {_gpus[worker.gpu_slot]}")
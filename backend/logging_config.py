@@ -0,0 +1,138 @@
+"""
+Logging setup: JSON log lines tagged with the request ID, formatted on a background thread
+"""
+import atexit
+import contextvars
+import datetime
+import json
+import logging as stdlib_logging
+import logging.handlers as stdlib_handlers
+import queue
+
+try:
+    import picologging as logging
+    from picologging.handlers import QueueHandler, QueueListener
+except ImportError:  # picologging has no wheels for some platforms/Python versions
+    import logging
+    from logging.handlers import QueueHandler, QueueListener
+
+# Request ID of the HTTP request being handled (copied into worker threads by asyncio.to_thread)
+request_id_var: contextvars.ContextVar = contextvars.ContextVar("request_id", default=None)
+
+_listener = None
+
+
+class JsonFormatter(logging.Formatter):
+    """Format records as single-line JSON objects"""
+
+    def format(self, record) -> str:
+        entry = {
+            "time": datetime.datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "request_id": getattr(record, "request_id", None)
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+
+        return json.dumps(entry)
+
+
+class RequestIdFilter(logging.Filter):
+    """
+    Attach the current request ID to each record
+
+    Runs on the caller's thread (it is attached to the queue handler), which is
+    where the request_id_var context is visible.
+    """
+
+    def filter(self, record) -> bool:
+        record.request_id = request_id_var.get()
+        return True
+
+
+class DeferredQueueHandler(QueueHandler):
+    """
+    Queue records as-is so formatting happens on the listener thread
+
+    The base QueueHandler formats records in prepare(), i.e. on the caller's
+    thread; records never leave the process here, so that is unnecessary.
+    """
+
+    def prepare(self, record):
+        return record
+
+
+class StdlibDeferredQueueHandler(stdlib_handlers.QueueHandler):
+    """DeferredQueueHandler for the stdlib root logger used by third-party libraries"""
+
+    def prepare(self, record):
+        return record
+
+
+def setup_logging(level=logging.INFO):
+    """
+    Route all logging through a queue drained by a background listener thread
+
+    Safe to call more than once; only the first call installs handlers.
+
+    Args:
+        level: Root logger level
+    """
+    global _listener
+
+    if _listener is not None:
+        return
+
+    log_queue = queue.Queue()
+
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(JsonFormatter())
+
+    queue_handler = DeferredQueueHandler(log_queue)
+    queue_handler.addFilter(RequestIdFilter())
+
+    root = logging.getLogger()
+    root.setLevel(level)
+    root.addHandler(queue_handler)
+
+    # With picologging, libraries logging through the stdlib (NeMo, uvicorn, ...)
+    # have a separate root logger; feed it into the same queue
+    if logging is not stdlib_logging:
+        stdlib_queue_handler = StdlibDeferredQueueHandler(log_queue)
+        stdlib_queue_handler.addFilter(RequestIdFilter())
+
+        stdlib_root = stdlib_logging.getLogger()
+        stdlib_root.setLevel(level)
+        stdlib_root.addHandler(stdlib_queue_handler)
+
+    _listener = QueueListener(log_queue, stream_handler)
+    _listener.start()
+    atexit.register(stop_logging)
+
+
+def stop_logging():
+    """
+    Write out queued records and stop the listener thread
+
+    Runs at exit; call it directly before os._exit(), which skips atexit hooks.
+    """
+    global _listener
+
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def get_logger(name: str):
+    """
+    Get a logger that writes through the background queue
+
+    Args:
+        name: Logger name, usually __name__
+
+    Returns:
+        Logger instance
+    """
+    return logging.getLogger(name)
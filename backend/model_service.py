@@ -1,14 +1,27 @@
 """
 Model service for loading and running NVIDIA Parakeet ASR model
 """
-import logging
-from typing import Dict, List, Optional
-import nemo.collections.asr as nemo_asr
-from config import MODEL_NAME
+import asyncio
+import contextlib
+import queue
+import threading
+from typing import Dict, List, Optional, Tuple, Union
+import numpy as np
+import soxr
+import torch
+from config import (
+    MODEL_NAME, SAMPLE_RATE, MAX_BATCH_SIZE, MAX_BATCH_SECONDS, BATCH_WINDOW_MS,
+    STAGING_BUCKETS, STAGING_MAX_SAMPLE_RATE, STAGING_PREALLOCATE, STAGING_POOL_MAX_BYTES
+)
+from logging_config import get_logger, setup_logging
 
 # Configure logging
-logging.basicConfig(level=logging.INFO)
-logger = logging.getLogger(__name__)
+setup_logging()
+logger = get_logger(__name__)
+
+# Input sample rates resampled on the GPU; others are resampled with soxr on the CPU,
+# since torchaudio's filter grows with rate / gcd(rate, 16000) and is cached per rate
+COMMON_SAMPLE_RATES = (8000, 22050, 32000, 44100, 48000)
 
 
 class ModelService:
@@ -20,6 +33,15 @@ class ModelService:
         """Initialize and load the ASR model"""
         self.model = None
         self.model_name = MODEL_NAME
+        self.dtype = None  # Reduced-precision dtype used on GPU, if any
+        self.gpu_sample_rates: Tuple[int, ...] = ()  # Input rates resampled on the GPU
+        self._resamplers = {}
+        self._staging_pool: Dict[int, queue.LifoQueue] = {}  # Pinned upload buffers by bucket
+        self._staging_bytes = 0  # Pinned memory owned by the pool
+        self._staging_lock = threading.Lock()
+        self._copy_stream = None  # Side CUDA stream for host-to-device copies
+        self._queue: Optional[asyncio.Queue] = None
+        self._batch_task: Optional[asyncio.Task] = None
         self._load_model()
 
     def _load_model(self):
@@ -28,6 +50,9 @@ class ModelService:
             logger.info(f"Loading NVIDIA Parakeet model: {self.model_name}")
             logger.info("This may take a few minutes on first run (downloading model)...")
 
+            # Imported lazily: NeMo pulls in Lightning/Hydra and dominates cold start
+            import nemo.collections.asr as nemo_asr
+
             self.model = nemo_asr.models.ASRModel.from_pretrained(
                 self.model_name
             )
@@ -35,10 +60,29 @@ class ModelService:
             logger.info("Model loaded successfully!")
 
             # Check if CUDA is available
-            import torch
             if torch.cuda.is_available():
                 logger.info(f"Using GPU: {torch.cuda.get_device_name(0)}")
                 self.model = self.model.cuda()
+
+                # Halve weight/activation bandwidth: BF16 on Ampere+, FP16 otherwise
+                major, _ = torch.cuda.get_device_capability()
+                if major >= 8:
+                    self.dtype = torch.bfloat16
+                    self.model = self.model.to(dtype=torch.bfloat16)
+                else:
+                    self.dtype = torch.float16
+                    self.model = self.model.half()
+                logger.info(f"Running inference in {self.dtype}")
+
+                # Cheap fallback for any ops that stay in FP32
+                torch.backends.cuda.matmul.allow_tf32 = True
+                torch.set_float32_matmul_precision('high')
+                torch.backends.cudnn.allow_tf32 = True
+
+                # Resample common rates on the GPU that consumes the audio
+                self._build_resamplers()
+                self._copy_stream = torch.cuda.Stream()
+                self._fill_staging_pool()
             else:
                 logger.info("Using CPU (consider using GPU for better performance)")
 
@@ -46,12 +90,166 @@ class ModelService:
             logger.error(f"Failed to load model: {str(e)}")
             raise RuntimeError(f"Model initialization failed: {str(e)}")
 
-    def transcribe(self, audio_path: str) -> Dict[str, any]:
+    def _inference_context(self):
+        """Autocast context matching the model dtype (no-op on CPU)"""
+        if self.dtype is None:
+            return contextlib.nullcontext()
+
+        return torch.autocast(device_type='cuda', dtype=self.dtype)
+
+    def _build_resamplers(self):
+        """Build GPU resamplers to SAMPLE_RATE for COMMON_SAMPLE_RATES, if torchaudio is installed"""
+        try:
+            import torchaudio
+        except ImportError:
+            logger.warning("torchaudio not installed, resampling on the CPU instead")
+            return
+
+        for sample_rate in COMMON_SAMPLE_RATES:
+            self._resamplers[sample_rate] = torchaudio.transforms.Resample(
+                sample_rate, SAMPLE_RATE, resampling_method='sinc_interp_kaiser'
+            ).cuda()
+        self.gpu_sample_rates = COMMON_SAMPLE_RATES
+
+    def _new_staging_buffer(self, seconds: int) -> Optional[torch.Tensor]:
         """
-        Transcribe audio file to text
+        Allocate a pooled pinned buffer for a bucket, within STAGING_POOL_MAX_BYTES
+
+        Returns:
+            Pinned buffer holding `seconds` of audio at STAGING_MAX_SAMPLE_RATE,
+            or None if the pool is already at its pinned-memory cap
+        """
+        num_bytes = seconds * STAGING_MAX_SAMPLE_RATE * 4
+        with self._staging_lock:
+            if self._staging_bytes + num_bytes > STAGING_POOL_MAX_BYTES:
+                return None
+            self._staging_bytes += num_bytes
+
+        return torch.empty(
+            seconds * STAGING_MAX_SAMPLE_RATE, dtype=torch.float32, pin_memory=True
+        )
+
+    def _fill_staging_pool(self):
+        """Pre-allocate the STAGING_PREALLOCATE pinned staging buffers"""
+        for seconds in STAGING_BUCKETS:
+            pool = queue.LifoQueue()
+            for _ in range(STAGING_PREALLOCATE.get(seconds, 0)):
+                buffer = self._new_staging_buffer(seconds)
+                if buffer is not None:
+                    pool.put(buffer)
+            self._staging_pool[seconds] = pool
+
+        logger.info(f"Pinned {self._staging_bytes / 2**20:.0f} MiB of upload staging buffers")
+
+    def _acquire_staging(
+        self, num_samples: int, sample_rate: int
+    ) -> Tuple[Optional[int], torch.Tensor]:
+        """
+        Take a pooled pinned buffer from the smallest bucket covering the audio's duration
+
+        Buffers hold their bucket's duration at STAGING_MAX_SAMPLE_RATE, so any
+        supported rate fits. An exhausted bucket grows the pool up to
+        STAGING_POOL_MAX_BYTES; past that cap, or for rates above
+        STAGING_MAX_SAMPLE_RATE, a one-off buffer is used and not pooled.
 
         Args:
-            audio_path: Path to audio file (WAV format, 16kHz recommended)
+            num_samples: Length of the audio
+            sample_rate: Sample rate of the audio
+
+        Returns:
+            Tuple of (bucket in seconds, or None for a one-off buffer; pinned buffer)
+        """
+        duration = num_samples / sample_rate
+        for seconds in STAGING_BUCKETS:
+            if duration <= seconds and num_samples <= seconds * STAGING_MAX_SAMPLE_RATE:
+                try:
+                    return seconds, self._staging_pool[seconds].get_nowait()
+                except queue.Empty:
+                    buffer = self._new_staging_buffer(seconds)
+                    if buffer is not None:
+                        return seconds, buffer
+                break
+
+        return None, torch.empty(num_samples, dtype=torch.float32, pin_memory=True)
+
+    def _upload(self, audios: List[np.ndarray], sample_rates: List[int]) -> List[torch.Tensor]:
+        """
+        Copy waveforms to the GPU through pooled pinned staging buffers
+
+        Copies are issued asynchronously on a side stream; the default stream
+        waits on them on the GPU, and the staging buffers go back to the pool
+        once the copies have landed.
+
+        Args:
+            audios: Mono float32 waveforms
+            sample_rates: Sample rate of each waveform
+
+        Returns:
+            CUDA tensors, one per waveform
+        """
+        staged = [
+            self._acquire_staging(len(audio), sample_rate)
+            for audio, sample_rate in zip(audios, sample_rates)
+        ]
+        try:
+            uploads = []
+            with torch.cuda.stream(self._copy_stream):
+                for audio, (_, buffer) in zip(audios, staged):
+                    host = buffer[:len(audio)]
+                    host.copy_(torch.from_numpy(audio))
+                    uploads.append(host.to('cuda', non_blocking=True))
+
+            # Order later kernels after the copies and keep the allocator from reusing them early
+            current_stream = torch.cuda.current_stream()
+            current_stream.wait_stream(self._copy_stream)
+            for upload in uploads:
+                upload.record_stream(current_stream)
+
+            return uploads
+
+        finally:
+            self._copy_stream.synchronize()
+            for seconds, buffer in staged:
+                if seconds is not None:
+                    self._staging_pool[seconds].put(buffer)
+
+    def _prepare_inputs(self, audios: List[np.ndarray], sample_rates: List[int]) -> list:
+        """
+        Bring decoded audio to 16kHz on the inference device
+
+        Rates in gpu_sample_rates are uploaded from pinned memory and resampled
+        on the GPU with a cached polyphase filter; any other rate is resampled
+        with soxr on the CPU first.
+
+        Args:
+            audios: Mono float32 waveforms
+            sample_rates: Sample rate of each waveform
+
+        Returns:
+            16kHz waveforms (CUDA tensors on GPU, numpy arrays on CPU)
+        """
+        audios, sample_rates = list(audios), list(sample_rates)
+        for i, sample_rate in enumerate(sample_rates):
+            if sample_rate != SAMPLE_RATE and sample_rate not in self.gpu_sample_rates:
+                audios[i] = soxr.resample(audios[i], sample_rate, SAMPLE_RATE, quality='HQ')
+                sample_rates[i] = SAMPLE_RATE
+
+        if self._copy_stream is not None:
+            audios = [
+                audio if sample_rate == SAMPLE_RATE
+                else self._resamplers[sample_rate](audio)
+                for audio, sample_rate in zip(self._upload(audios, sample_rates), sample_rates)
+            ]
+
+        return audios
+
+    def transcribe(self, audio: np.ndarray, sample_rate: int = SAMPLE_RATE) -> Dict[str, any]:
+        """
+        Transcribe decoded audio to text
+
+        Args:
+            audio: Mono float32 waveform
+            sample_rate: Sample rate of the waveform (resampled to 16kHz if different)
 
         Returns:
             Dictionary containing transcription results:
@@ -66,10 +264,13 @@ class ModelService:
             raise RuntimeError("Model not loaded")
 
         try:
-            logger.info(f"Transcribing audio file: {audio_path}")
+            logger.info(f"Transcribing {len(audio)} samples")
+
+            # Perform transcription directly on the in-memory waveform
+            audio, = self._prepare_inputs([audio], [sample_rate])
 
-            # Perform transcription
-            output = self.model.transcribe([audio_path])
+            with self._inference_context():
+                output = self.model.transcribe([audio])
 
             # Extract transcription text
             text = output[0] if isinstance(output[0], str) else output[0].text
@@ -93,12 +294,17 @@ class ModelService:
             logger.error(f"Transcription failed: {str(e)}")
             raise RuntimeError(f"Transcription failed: {str(e)}")
 
-    def transcribe_batch(self, audio_paths: List[str]) -> List[Dict[str, any]]:
+    def transcribe_batch(
+        self,
+        audio_paths: Union[List[str], List[np.ndarray]],
+        sample_rates: Optional[List[int]] = None
+    ) -> List[Dict[str, any]]:
         """
         Transcribe multiple audio files in batch
 
         Args:
-            audio_paths: List of paths to audio files
+            audio_paths: List of paths to audio files, or of mono float32 waveforms
+            sample_rates: Sample rate of each waveform (defaults to 16kHz)
 
         Returns:
             List of transcription result dictionaries
@@ -109,8 +315,14 @@ class ModelService:
         try:
             logger.info(f"Batch transcribing {len(audio_paths)} files")
 
-            # Perform batch transcription
-            outputs = self.model.transcribe(audio_paths)
+            if audio_paths and isinstance(audio_paths[0], np.ndarray):
+                if sample_rates is None:
+                    sample_rates = [SAMPLE_RATE] * len(audio_paths)
+                audio_paths = self._prepare_inputs(audio_paths, sample_rates)
+
+            # Perform batch transcription in a single forward pass
+            with self._inference_context():
+                outputs = self.model.transcribe(audio_paths, batch_size=len(audio_paths))
 
             results = []
             for output in outputs:
@@ -129,6 +341,127 @@ class ModelService:
             logger.error(f"Batch transcription failed: {str(e)}")
             raise RuntimeError(f"Batch transcription failed: {str(e)}")
 
+    def start_batching(self):
+        """
+        Start the background task that coalesces queued requests into batches
+
+        Must be called from within the running event loop.
+        """
+        if self._batch_task is None:
+            self._queue = asyncio.Queue()
+            self._batch_task = asyncio.create_task(self._batch_worker())
+            logger.info(
+                f"Request batching enabled (max {MAX_BATCH_SIZE}, window {BATCH_WINDOW_MS}ms)"
+            )
+
+    async def stop_batching(self):
+        """Stop the batching task"""
+        if self._batch_task is not None:
+            self._batch_task.cancel()
+            try:
+                await self._batch_task
+            except asyncio.CancelledError:
+                pass
+            self._batch_task = None
+            self._queue = None
+
+    async def transcribe_async(
+        self, audio: np.ndarray, sample_rate: int = SAMPLE_RATE
+    ) -> Dict[str, any]:
+        """
+        Queue decoded audio for batched transcription and wait for the result
+
+        Args:
+            audio: Mono float32 waveform
+            sample_rate: Sample rate of the waveform (resampled to 16kHz if different)
+
+        Returns:
+            Dictionary containing transcription results (see transcribe)
+
+        Raises:
+            RuntimeError: If transcription fails
+        """
+        if self._queue is None:
+            return await asyncio.to_thread(self.transcribe, audio, sample_rate)
+
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((audio, sample_rate, future))
+        return await future
+
+    async def _batch_worker(self):
+        """Drain the queue in batches and run one model call per batch"""
+        loop = asyncio.get_running_loop()
+        carried = None  # Request that did not fit in the previous batch
+
+        def seconds(item):
+            return len(item[0]) / item[1]
+
+        while True:
+            if carried is not None:
+                batch, carried = [carried], None
+            else:
+                batch = [await self._queue.get()]
+            total_seconds = seconds(batch[0])
+
+            # Collect more requests until the batch is full or the window closes;
+            # an input longer than MAX_BATCH_SECONDS on its own runs alone
+            deadline = loop.time() + BATCH_WINDOW_MS / 1000
+            while len(batch) < MAX_BATCH_SIZE and total_seconds < MAX_BATCH_SECONDS:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+
+                if total_seconds + seconds(item) > MAX_BATCH_SECONDS:
+                    carried = item
+                    break
+                batch.append(item)
+                total_seconds += seconds(item)
+
+            # Drop requests whose callers have gone away
+            batch = [item for item in batch if not item[2].done()]
+            if not batch:
+                continue
+
+            # Longest first to minimise padding waste
+            batch.sort(key=seconds, reverse=True)
+
+            try:
+                results = await asyncio.to_thread(
+                    self.transcribe_batch,
+                    [audio for audio, _, _ in batch],
+                    [sample_rate for _, sample_rate, _ in batch]
+                )
+            except Exception as e:
+                if len(batch) == 1:
+                    if not batch[0][2].done():
+                        batch[0][2].set_exception(e)
+                    continue
+
+                # Retry one by one so a single bad or oversized input cannot fail its neighbours
+                logger.warning(f"Batch of {len(batch)} failed, retrying individually")
+                if torch.cuda.is_available():
+                    torch.cuda.empty_cache()
+                for audio, sample_rate, future in batch:
+                    try:
+                        result, = await asyncio.to_thread(
+                            self.transcribe_batch, [audio], [sample_rate]
+                        )
+                    except Exception as item_error:
+                        if not future.done():
+                            future.set_exception(item_error)
+                    else:
+                        if not future.done():
+                            future.set_result(result)
+                continue
+
+            for (_, _, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
     def get_model_info(self) -> Dict[str, str]:
         """
         Get information about the loaded model
@@ -136,8 +469,6 @@ class ModelService:
         Returns:
             Dictionary with model information
         """
-        import torch
-
         return {
             "model_name": self.model_name,
             "device": "cuda" if torch.cuda.is_available() else "cpu",
@@ -147,18 +478,26 @@ class ModelService:
 
 # Global model instance (singleton pattern)
 _model_service_instance: Optional[ModelService] = None
+_lock = threading.Lock()
+
+# Set once the model has finished loading; safe to check from any thread
+model_service_ready = threading.Event()
 
 
 def get_model_service() -> ModelService:
     """
     Get or create the global model service instance
 
+    Creation is serialized so concurrent callers can never load the model twice.
+
     Returns:
         ModelService instance
     """
     global _model_service_instance
 
-    if _model_service_instance is None:
-        _model_service_instance = ModelService()
+    with _lock:
+        if _model_service_instance is None:
+            _model_service_instance = ModelService()
+            model_service_ready.set()
 
     return _model_service_instance
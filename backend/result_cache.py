@@ -0,0 +1,87 @@
+"""
+LRU cache of transcription results keyed by a hash of the uploaded audio
+"""
+import asyncio
+from collections import OrderedDict
+from typing import BinaryIO, Dict, Optional
+
+import xxhash
+
+# Chunk size used when hashing uploads
+HASH_CHUNK_SIZE = 1 << 20  # 1 MiB
+
+
+def hash_upload(file: BinaryIO) -> str:
+    """
+    Hash an uploaded file's contents with xxh3-64, reading it in chunks
+
+    Args:
+        file: Seekable binary file object; it is rewound before returning
+
+    Returns:
+        Hex digest of the file contents
+    """
+    hasher = xxhash.xxh3_64()
+    file.seek(0)
+    while chunk := file.read(HASH_CHUNK_SIZE):
+        hasher.update(chunk)
+    file.seek(0)
+
+    return hasher.hexdigest()
+
+
+class ResultCache:
+    """
+    Bounded LRU cache of transcription results for repeated uploads
+    """
+
+    def __init__(self, max_entries: int):
+        """
+        Args:
+            max_entries: Maximum number of results kept before evicting the oldest
+        """
+        self.max_entries = max_entries
+        self._cache: "OrderedDict[str, Dict[str, any]]" = OrderedDict()
+        self._lock = asyncio.Lock()
+
+    async def get(self, key: str) -> Optional[Dict[str, any]]:
+        """
+        Look up a cached result, marking it as most recently used
+
+        Args:
+            key: Content hash of the upload
+
+        Returns:
+            Cached result, or None on a miss
+        """
+        async with self._lock:
+            if key not in self._cache:
+                return None
+            self._cache.move_to_end(key)
+            return self._cache[key]
+
+    async def put(self, key: str, result: Dict[str, any]):
+        """
+        Store a result, evicting the least recently used entry if full
+
+        Args:
+            key: Content hash of the upload
+            result: Transcription result to cache
+        """
+        async with self._lock:
+            self._cache[key] = result
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+
+    async def clear(self) -> int:
+        """
+        Remove all cached results
+
+        Returns:
+            Number of entries removed
+        """
+        async with self._lock:
+            count = len(self._cache)
+            self._cache.clear()
+            return count